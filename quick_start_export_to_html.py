@@ -1,4 +1,9 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import networkx as nx
 import pyvis.network as net
+from src.utils.nlp.doc_context import DocContext
 from src.utils.nlp.entity_extractor import EntityExtractor
 from src.utils.nlp.relation_extractor import RelationExtractor
 from src.utils.nlp.knowledge_graph import KnowledgeGraph
@@ -12,35 +17,88 @@ def process_text(text):
     event_extractor = EventExtractor()
     temporal_analyzer = TemporalAnalyzer()
     kg = KnowledgeGraph()
-    
-    # 处理流程
-    entities = entity_extractor.extract_entities(text)
+
+    # 处理流程，分词只做一次并在各抽取器间共享
+    ctx = DocContext(text)
+    entities = entity_extractor.extract_entities(ctx)
     relations = relation_extractor.extract_relations(text, entities)
-    events = event_extractor.extract_events(text, entities)
+    events = event_extractor.extract_events(ctx, entities)
     temporal_relations = temporal_analyzer.extract_temporal_relations(text, entities)
     
     # 添加到知识图谱
     kg.add_relations(relations)
-    
+
     return entities, relations, events, temporal_relations, kg
 
+# 每个工作进程只构建一次抽取器（含BERT），避免反复加载
+_worker_extractors = None
+
+def _process_one_document(text):
+    """子进程内处理单篇文档，返回(实体, 关系, 事件, 时序关系)"""
+    global _worker_extractors
+    if _worker_extractors is None:
+        _worker_extractors = (
+            EntityExtractor(),
+            RelationExtractor(),
+            EventExtractor(),
+            TemporalAnalyzer()
+        )
+    entity_extractor, relation_extractor, event_extractor, temporal_analyzer = _worker_extractors
+
+    ctx = DocContext(text)
+    entities = entity_extractor.extract_entities(ctx)
+    relations = relation_extractor.extract_relations(text, entities)
+    events = event_extractor.extract_events(ctx, entities)
+    temporal_relations = temporal_analyzer.extract_temporal_relations(text, entities)
+    return entities, relations, events, temporal_relations
+
+def process_documents(texts):
+    """多进程并行处理一批文档，按文档粒度利用多核
+
+    Returns:
+        (每篇文档的处理结果列表, 汇总了所有关系的知识图谱)
+    """
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(_process_one_document, texts))
+
+    kg = KnowledgeGraph()
+    for _, relations, _, _ in results:
+        kg.add_relations(relations)
+
+    return results, kg
+
+# 节点颜色
+NODE_COLORS = {
+    'Company': '#ff7675',
+    'Person': '#74b9ff',
+    'Product': '#55efc4',
+    'Time': '#a29bfe',
+    'Amount': '#ffeaa7'
+}
+
+# 超过这个节点数就跳过pyvis，直接写vis-network JSON
+LARGE_GRAPH_NODES = 500
+
 def visualize_knowledge_graph(kg):
     """可视化知识图谱并保存为HTML文件"""
+    # 大图走直接写JSON的快速路径，省掉pyvis逐节点拼模板的开销
+    if kg.graph.number_of_nodes() > LARGE_GRAPH_NODES:
+        write_vis_network_html(kg)
+        return
+
     network = net.Network(height='600px', width='100%', bgcolor='#ffffff', font_color='black')
-    
-    # 设置节点颜色
-    colors = {
-        'Company': '#ff7675',
-        'Person': '#74b9ff',
-        'Product': '#55efc4',
-        'Time': '#a29bfe',
-        'Amount': '#ffeaa7'
-    }
+
+    colors = NODE_COLORS
+
+    # 在Python端预先算好布局，浏览器不再跑物理仿真，渲染即刻完成
+    pos = nx.spring_layout(kg.graph, seed=42, scale=1000)
 
     for node in kg.graph.nodes():
         node_type = kg.graph.nodes[node].get('type', 'default')
         color = colors.get(node_type, '#95a5a6')
-        network.add_node(node, label=node, title=node, color=color)
+        network.add_node(node, label=node, title=node, color=color,
+                        x=float(pos[node][0]), y=float(pos[node][1]),
+                        physics=False)
     
     # 添加边
     for edge in kg.graph.edges(data=True):
@@ -51,8 +109,7 @@ def visualize_knowledge_graph(kg):
                         arrows='to')
     
     # 布局
-    network.set_options('''
-    var options = {
+    options = {
         "nodes": {
             "shape": "dot",
             "size": 20,
@@ -64,20 +121,85 @@ def visualize_knowledge_graph(kg):
             "smooth": {"type": "continuous"}
         },
         "physics": {
-            "forceAtlas2Based": {
-                "gravitationalConstant": -50,
-                "centralGravity": 0.01,
-                "springLength": 100,
-                "springConstant": 0.08
-            },
-            "solver": "forceAtlas2Based"
+            "enabled": False,
+            "stabilization": {"enabled": False}
+        },
+        "interaction": {
+            "hideEdgesOnDrag": True
         }
     }
-    ''')
+
+    # 稍大的图关掉美化布局和平滑曲线，初次渲染快一个量级
+    if kg.graph.number_of_nodes() > 200:
+        options["layout"] = {"improvedLayout": False, "randomSeed": 42}
+        options["edges"]["smooth"] = {"type": "discrete"}
+        options["interaction"]["hideEdgesOnZoom"] = True
+
+    network.set_options(f'var options = {json.dumps(options)}')
 
     network.save_graph('knowledge_graph.html')
     print("知识图谱已保存为 knowledge_graph.html")
 
+def write_vis_network_html(kg, filepath='knowledge_graph.html'):
+    """直接生成vis-network的数据JSON和HTML，不经过pyvis"""
+    pos = nx.spring_layout(kg.graph, seed=42, scale=1000)
+
+    data = {
+        'nodes': [
+            {
+                'id': node,
+                'label': node,
+                'title': node,
+                'color': NODE_COLORS.get(kg.graph.nodes[node].get('type', 'default'), '#95a5a6'),
+                'x': float(pos[node][0]),
+                'y': float(pos[node][1])
+            }
+            for node in kg.graph.nodes()
+        ],
+        'edges': [
+            {
+                'from': head,
+                'to': tail,
+                'label': edge_data['relation_type'],
+                'title': edge_data['relation_type'],
+                'arrows': 'to'
+            }
+            for head, tail, edge_data in kg.graph.edges(data=True)
+        ]
+    }
+
+    options = {
+        'nodes': {'shape': 'dot', 'size': 20, 'font': {'size': 14}},
+        'edges': {
+            'font': {'size': 12, 'align': 'middle'},
+            'color': {'color': '#848484'},
+            'smooth': False
+        },
+        'physics': {'enabled': False, 'stabilization': {'enabled': False}},
+        'interaction': {'hideEdgesOnDrag': True}
+    }
+
+    html = f'''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <script src="https://unpkg.com/vis-network/standalone/umd/vis-network.min.js"></script>
+    <style>#graph {{width: 100%; height: 600px; background-color: #ffffff;}}</style>
+</head>
+<body>
+    <div id="graph"></div>
+    <script>
+        var data = {json.dumps(data, ensure_ascii=False)};
+        var options = {json.dumps(options)};
+        new vis.Network(document.getElementById("graph"), data, options);
+    </script>
+</body>
+</html>'''
+
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(html)
+    print(f"知识图谱已保存为 {filepath}")
+
 def main():
     """主函数"""
     try:
@@ -1,8 +1,21 @@
 from typing import List, Tuple, Dict
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from neo4j import GraphDatabase
+import csv
 import logging
+import os
+import re
 
 class Neo4jExporter:
+    # 每个事务批量写入的行数
+    BATCH_SIZE = 1000
+    # 并行写入的线程数，driver连接池线程安全
+    MAX_WORKERS = 8
+    # 导出时常见的实体标签（与EntityExtractor的实体类型一致）
+    ENTITY_LABELS = ['Company', 'Industry', 'Product', 'Time', 'Amount',
+                     'Person', 'Metric', 'Currency']
+
     def __init__(self, uri: str, username: str, password: str):
         """初始化 Neo4j 导出器
         
@@ -38,48 +51,183 @@ class Neo4jExporter:
 
     def export_entities(self, entities: List[Tuple[str, str, Dict]]):
         """导出实体到 Neo4j
-        
+
+        按实体类型分组后用 UNWIND 批量写入，避免每个实体一次网络往返
+
         Args:
             entities: 实体列表，每个实体是一个元组 (name, type, properties)
         """
-        with self.driver.session() as session:
-            for name, entity_type, properties in entities:
-                # 确保所有属性值都是基本类型
-                clean_props = self._clean_properties(properties)
-                
-                # 创建实体节点Cypher查询
-                cypher = (
-                    "MERGE (n:%s {name: $name}) "
-                    "SET n += $properties "
-                    "RETURN n"
-                ) % entity_type
-                
-                try:
-                    session.run(cypher, name=name, properties=clean_props)
-                except Exception as e:
-                    logging.error(f"导出实体 {name} 失败: {str(e)}")
+        # 按类型（即节点标签）分组
+        grouped = defaultdict(list)
+        for name, entity_type, properties in entities:
+            if not self._is_valid_label(entity_type):
+                logging.error(f"非法的实体类型标签: {entity_type}，跳过实体 {name}")
+                continue
+            # embedding向量又大又没法在图里查询，不随属性导出
+            props = {k: v for k, v in properties.items() if k != 'embedding'}
+            grouped[entity_type].append({
+                'name': name,
+                'props': self._clean_properties(props)
+            })
+
+        tasks = []
+        for entity_type, rows in grouped.items():
+            # 额外打上共享的:Entity标签，关系导入可走name索引
+            cypher = (
+                "UNWIND $rows AS row "
+                "MERGE (n:`%s` {name: row.name}) "
+                "SET n:Entity "
+                "SET n += row.props"
+            ) % entity_type
+            for chunk in self._chunks(rows):
+                tasks.append((cypher, chunk, f"实体({entity_type})"))
+
+        self._run_write_chunks(tasks)
 
     def export_relations(self, relations: List[Tuple[str, str, str, Dict]]):
         """导出关系到 Neo4j
-        
+
+        按关系类型分组后用 UNWIND 批量写入
+
+        Args:
+            relations: 关系列表，每个关系是一个元组 (head, relation_type, tail, properties)
+        """
+        grouped = defaultdict(list)
+        for head, rel_type, tail, properties in relations:
+            if not self._is_valid_label(rel_type):
+                logging.error(f"非法的关系类型标签: {rel_type}，跳过关系 {head}->{tail}")
+                continue
+            grouped[rel_type].append({
+                'head': head,
+                'tail': tail,
+                'props': self._clean_properties(properties)
+            })
+
+        tasks = []
+        for rel_type, rows in grouped.items():
+            # 带:Entity标签的MATCH走索引，避免全库节点扫描
+            cypher = (
+                "UNWIND $rows AS row "
+                "MATCH (head:Entity {name: row.head}), (tail:Entity {name: row.tail}) "
+                "MERGE (head)-[r:`%s`]->(tail) "
+                "SET r += row.props"
+            ) % rel_type
+            for chunk in self._chunks(rows):
+                tasks.append((cypher, chunk, f"关系({rel_type})"))
+
+        self._run_write_chunks(tasks)
+
+    def _write_chunk(self, tx, cypher: str, chunk: List[Dict]):
+        """事务函数：把一块行数据写入数据库（失败时driver会自动重试）"""
+        tx.run(cypher, rows=chunk).consume()
+
+    def _run_write_chunks(self, tasks: List[Tuple[str, List[Dict], str]]):
+        """多线程并行写入各数据块，每个线程使用独立session"""
+        def write(task):
+            cypher, chunk, desc = task
+            with self.driver.session() as session:
+                try:
+                    session.execute_write(self._write_chunk, cypher, chunk)
+                except Exception as e:
+                    logging.error(f"批量导出{desc}失败: {str(e)}")
+
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            list(executor.map(write, tasks))
+
+    def export_via_csv(self, entities: List[Tuple[str, str, Dict]],
+                       relations: List[Tuple[str, str, str, Dict]],
+                       import_dir: str):
+        """首次全量导入的快速路径：先写CSV再用LOAD CSV批量建图
+
+        比逐批UNWIND更快，适合clear_database后的整库重建。
+        CSV必须写入Neo4j的import目录；属性值以字符串形式导入，
+        列表类型的属性会被跳过
+
         Args:
+            entities: 实体列表，每个实体是一个元组 (name, type, properties)
             relations: 关系列表，每个关系是一个元组 (head, relation_type, tail, properties)
+            import_dir: Neo4j 的 import 目录路径
         """
+        # 按标签分组写实体CSV，每个标签一个文件
+        grouped_entities = defaultdict(list)
+        for name, entity_type, properties in entities:
+            if not self._is_valid_label(entity_type):
+                logging.error(f"非法的实体类型标签: {entity_type}，跳过实体 {name}")
+                continue
+            props = {k: v for k, v in properties.items() if k != 'embedding'}
+            grouped_entities[entity_type].append((name, self._clean_properties(props)))
+
+        grouped_relations = defaultdict(list)
+        for head, rel_type, tail, properties in relations:
+            if not self._is_valid_label(rel_type):
+                logging.error(f"非法的关系类型标签: {rel_type}，跳过关系 {head}->{tail}")
+                continue
+            grouped_relations[rel_type].append((head, tail, self._clean_properties(properties)))
+
         with self.driver.session() as session:
-            for head, rel_type, tail, properties in relations:
-                clean_props = self._clean_properties(properties)
+            for entity_type, rows in grouped_entities.items():
+                filename = f"entities_{entity_type}.csv"
+                prop_keys = self._write_csv(
+                    os.path.join(import_dir, filename),
+                    ['name'], [(
+                        {'name': name, **props}) for name, props in rows])
+
+                set_clause = ' '.join(
+                    f"SET n.`{k}` = row.`{k}`" for k in prop_keys if k != 'name')
                 cypher = (
-                    "MATCH (head), (tail) "
-                    "WHERE head.name = $head AND tail.name = $tail "
-                    "MERGE (head)-[r:%s]->(tail) "
-                    "SET r += $properties "
-                    "RETURN r"
-                ) % rel_type
-                
+                    f"LOAD CSV WITH HEADERS FROM 'file:///{filename}' AS row "
+                    "CALL { WITH row "
+                    f"MERGE (n:`{entity_type}` {{name: row.name}}) SET n:Entity {set_clause} "
+                    "} IN TRANSACTIONS OF 10000 ROWS"
+                )
                 try:
-                    session.run(cypher, head=head, tail=tail, properties=clean_props)
+                    session.run(cypher)
                 except Exception as e:
-                    logging.error(f"导出关系 {head}-[{rel_type}]->{tail} 失败: {str(e)}")
+                    logging.error(f"LOAD CSV 导入实体({entity_type})失败: {str(e)}")
+
+            for rel_type, rows in grouped_relations.items():
+                filename = f"relations_{rel_type}.csv"
+                prop_keys = self._write_csv(
+                    os.path.join(import_dir, filename),
+                    ['head', 'tail'], [(
+                        {'head': head, 'tail': tail, **props}) for head, tail, props in rows])
+
+                set_clause = ' '.join(
+                    f"SET r.`{k}` = row.`{k}`" for k in prop_keys if k not in ('head', 'tail'))
+                cypher = (
+                    f"LOAD CSV WITH HEADERS FROM 'file:///{filename}' AS row "
+                    "CALL { WITH row "
+                    "MATCH (head:Entity {name: row.head}), (tail:Entity {name: row.tail}) "
+                    f"MERGE (head)-[r:`{rel_type}`]->(tail) {set_clause} "
+                    "} IN TRANSACTIONS OF 10000 ROWS"
+                )
+                try:
+                    session.run(cypher)
+                except Exception as e:
+                    logging.error(f"LOAD CSV 导入关系({rel_type})失败: {str(e)}")
+
+    def _write_csv(self, filepath: str, key_columns: List[str], rows: List[Dict]) -> List[str]:
+        """把行字典写成CSV，返回表头列名（列表属性不写入）"""
+        prop_keys = sorted({
+            k for row in rows for k, v in row.items()
+            if k not in key_columns and not isinstance(v, list)
+        })
+        columns = key_columns + prop_keys
+        with open(filepath, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({k: row.get(k, '') for k in columns})
+        return columns
+
+    def _chunks(self, rows: List[Dict]):
+        """把行列表切分成 BATCH_SIZE 大小的块"""
+        for i in range(0, len(rows), self.BATCH_SIZE):
+            yield rows[i:i + self.BATCH_SIZE]
+
+    def _is_valid_label(self, label: str) -> bool:
+        """校验标签/关系类型是否合法，防止Cypher注入"""
+        return bool(label) and bool(re.fullmatch(r'\w+', label))
 
     def _clean_properties(self, properties: Dict) -> Dict:
         """清理属性值，确保它们是 Neo4j 支持的类型
@@ -115,12 +263,20 @@ class Neo4jExporter:
             except Exception as e:
                 logging.error(f"清空数据库失败: {str(e)}")
 
-    def create_indexes(self):
-        """创建必要的索引"""
+    def create_indexes(self, labels: List[str] = None):
+        """创建必要的索引
+
+        Args:
+            labels: 需要建索引的实体标签，默认为ENTITY_LABELS
+        """
         with self.driver.session() as session:
             try:
-                # 为实体名称创建索引
+                # 为实体名称创建索引（共享标签加各具体标签）
                 session.run("CREATE INDEX IF NOT EXISTS FOR (n:Entity) ON (n.name)")
+                for label in (labels or self.ENTITY_LABELS):
+                    if self._is_valid_label(label):
+                        session.run(
+                            f"CREATE INDEX IF NOT EXISTS FOR (n:`{label}`) ON (n.name)")
                 logging.info("索引创建成功")
             except Exception as e:
                 logging.error(f"创建索引失败: {str(e)}")
@@ -1,39 +1,119 @@
+from typing import List
+from functools import lru_cache
 from transformers import BertTokenizer, BertModel
 import torch
 import numpy as np
 
+# 进程内共享的模型缓存，按模型名只加载一次
+_MODEL_CACHE = {}
+
+
+def _load_bert(model_name: str = 'bert-base-chinese'):
+    """加载并缓存BERT模型，多个抽取器共享同一份实例"""
+    if model_name not in _MODEL_CACHE:
+        tokenizer = BertTokenizer.from_pretrained(model_name)
+        model = BertModel.from_pretrained(model_name)
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        model.to(device).eval()
+        if device == 'cuda':
+            # GPU上常驻半精度权重，显存和带宽都减半
+            model.half()
+        else:
+            # CPU上把Linear层动态量化到int8，前向提速且几乎不损精度
+            try:
+                torch.backends.quantized.engine = 'fbgemm'
+                model = torch.quantization.quantize_dynamic(
+                    model, {torch.nn.Linear}, dtype=torch.qint8)
+            except Exception:
+                pass  # 量化不可用时保持FP32
+        if hasattr(torch, 'compile'):
+            # 编译后的图消除重复前向的解释器开销。torch.compile是
+            # 惰性的，编译失败要到首次前向才暴露，所以在这里预热
+            # 一次，出错就退回eager模型
+            try:
+                compiled = torch.compile(model, mode='reduce-overhead')
+                warmup = tokenizer('预热', return_tensors='pt')
+                warmup = {k: v.to(device) for k, v in warmup.items()}
+                with torch.inference_mode():
+                    compiled(**warmup)
+                model = compiled
+            except Exception:
+                pass  # 编译或预热前向失败时用原模型
+        _MODEL_CACHE[model_name] = (tokenizer, model, device)
+    return _MODEL_CACHE[model_name]
+
+
 class BaseProcessor:
     def __init__(self):
         """初始化基础处理器"""
-        # 加载BERT模型
+        # 加载BERT模型（进程内共享，不重复加载）
         try:
-            self.tokenizer = BertTokenizer.from_pretrained('bert-base-chinese')
-            self.model = BertModel.from_pretrained('bert-base-chinese')
+            self.tokenizer, self.model, self.device = _load_bert()
         except:
             print("!!!!!：BERT模型未安装")
             self.tokenizer = None
             self.model = None
+            self.device = 'cpu'
+
+        # 向量缓存，同一文本只做一次BERT前向
+        self._cached_embed = lru_cache(maxsize=4096)(self._embed_one)
 
     def get_text_embedding(self, text: str) -> np.ndarray:
         """获取文本的向量表示"""
         if not self.model or not self.tokenizer:
             return np.zeros(768)  # 返回零向量作为默认值
-            
-        inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).squeeze().numpy()
+
+        return self._cached_embed(text)
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        """计算单条文本的向量（未缓存）"""
+        return self.get_text_embeddings([text])[0]
+
+    def get_text_embeddings(self, texts: List[str]) -> np.ndarray:
+        """批量获取文本的向量表示
+
+        一次tokenize并前向整个批次，比逐条调用BERT快得多。
+        返回的向量已做L2归一化，余弦相似度退化为点积
+
+        Args:
+            texts: 文本列表
+        Returns:
+            (N, 768) 的单位向量矩阵
+        """
+        if not texts:
+            return np.zeros((0, 768))
+        if not self.model or not self.tokenizer:
+            return np.zeros((len(texts), 768))
+
+        # 分块前向，实体很多时也不会攒出超大批次撑爆内存
+        batch_size = 64
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            inputs = self.tokenizer(batch, return_tensors="pt", padding=True, truncation=True)
+            inputs = {k: v.to(self.device, non_blocking=True) for k, v in inputs.items()}
+            with torch.inference_mode():
+                outputs = self.model(**inputs)
+            # 按attention_mask做掩码均值：PAD位置不计入池化，
+            # 否则向量会随批内最长文本变化，与单条路径不一致
+            mask = inputs['attention_mask'].unsqueeze(-1)
+            pooled = ((outputs.last_hidden_state * mask).sum(dim=1)
+                      / mask.sum(dim=1).clamp(min=1))
+            chunks.append(pooled.float().cpu().numpy())
+        embeddings = np.concatenate(chunks, axis=0)
+
+        # 生成时就归一化，后续相似度只需一次点积；
+        # 连续的float32布局对BLAS/faiss最友好
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return np.ascontiguousarray(embeddings / norms, dtype=np.float32)
 
     def calculate_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """计算两个向量的余弦相似度"""
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        if norm1 == 0 or norm2 == 0:
-            return 0
-        return np.dot(vec1, vec2) / (norm1 * norm2)
+        """计算两个单位向量的余弦相似度（向量须已L2归一化）"""
+        return float(np.dot(vec1, vec2))
 
     def get_context_window(self, text: str, start: int, end: int, window_size: int = 50) -> str:
         """获取指定位置的上下文窗口"""
         start = max(0, start - window_size)
         end = min(len(text), end + window_size)
-        return text[start:end] 
\ No newline at end of file
+        return text[start:end]
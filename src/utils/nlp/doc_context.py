@@ -0,0 +1,29 @@
+import jieba.posseg as pseg
+from typing import Dict, List, Tuple
+
+
+class DocContext:
+    """文档级共享上下文
+
+    同一篇文本的jieba词性标注只做一次，各抽取器复用分词结果，
+    并记录每个词的起始偏移，省去下游的text.find扫描
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pseg_tokens: List[Tuple[str, str]] = []
+        self.positions: List[int] = []
+        # 每个词首次出现的偏移，O(1)替代text.find
+        self.word_offsets: Dict[str, int] = {}
+
+        offset = 0
+        for word, flag in pseg.cut(text):
+            self.pseg_tokens.append((word, flag))
+            self.positions.append(offset)
+            self.word_offsets.setdefault(word, offset)
+            offset += len(word)
+
+    @classmethod
+    def ensure(cls, doc) -> 'DocContext':
+        """既接受原始文本也接受已构建好的上下文"""
+        return doc if isinstance(doc, cls) else cls(doc)
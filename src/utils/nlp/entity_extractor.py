@@ -4,6 +4,8 @@ import re
 from typing import List, Tuple, Dict, Set
 from collections import defaultdict
 from .base_processor import BaseProcessor
+from .doc_context import DocContext
+from .structures import Entity
 '''
 更详细的ner，参考我的另外一个GitHub项目：https://github.com/EasonWong0327/NLP-NER
 '''
@@ -18,48 +20,54 @@ class EntityExtractor(BaseProcessor):
         # 加载金融领域词典
         self._load_finance_dict()
 
-    def extract_entities(self, text: str) -> List[Tuple[str, str, Dict]]:
+    def extract_entities(self, doc) -> List[Tuple[str, str, Dict]]:
         """
         实体识别
         Args:
-            text: 输入文本
+            doc: 输入文本或已构建的DocContext（复用分词结果）
         Returns:
             实体列表，每个实体为(实体文本, 实体类型, 属性字典)的元组
         """
-        entities = []
-        seen_entities = {}  # 用于去重的字典
-        
+        ctx = DocContext.ensure(doc)
+        text = ctx.text
+        seen_keys = {}  # 用于去重的字典，(实体文本, 实体类型) -> None
+
         # 1使用预训练NER模型识别实体
         ner_results = self.ner_model.predict(text)
         if ner_results:
             for result in ner_results:
                 entity_text, entity_type = result
-                properties = self._extract_entity_properties(entity_text, entity_type)
-                entity_key = (entity_text, entity_type)
-                seen_entities[entity_key] = (entity_text, entity_type, properties)
-        
-        # 2 规则模式
-        for entity_type, patterns in self.entity_patterns.items():
-            for pattern in patterns:
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    entity_text = match.group()
-                    # 获取实体属性
-                    properties = self._extract_entity_properties(entity_text, entity_type)
-                    entity_key = (entity_text, entity_type)
-                    seen_entities[entity_key] = (entity_text, entity_type, properties)
-        
-        # 3 jieba分词进行补充识别
-        words = pseg.cut(text)
-        for word, flag in words:
+                seen_keys[(entity_text, entity_type)] = None
+
+        # 2 规则模式，单遍扫描融合后的大正则
+        for match in self._fused_pattern.finditer(text):
+            entity_text = match.group()
+            entity_type = match.lastgroup.rsplit('_', 1)[0]
+            seen_keys[(entity_text, entity_type)] = None
+        # $锚定的后缀模式逐个扫描（见_load_finance_dict的说明）
+        for entity_type, pattern in self._anchored_patterns:
+            for match in pattern.finditer(text):
+                seen_keys[(match.group(), entity_type)] = None
+
+        # 3 jieba分词进行补充识别（复用上下文中的分词结果）
+        for word, flag in ctx.pseg_tokens:
             if flag.startswith('n'):  # n
                 entity_type = self._determine_entity_type(word)
                 if entity_type:
-                    properties = self._extract_entity_properties(word, entity_type)
-                    entity_key = (word, entity_type)
-                    seen_entities[entity_key] = (word, entity_type, properties)
+                    seen_keys[(word, entity_type)] = None
+
+        # 去重后每个实体只提取一次属性
+        entities = [
+            Entity(entity_text, entity_type,
+                   self._extract_entity_properties(entity_text, entity_type))
+            for entity_text, entity_type in seen_keys
+        ]
+
+        # 批量计算实体向量，一次前向整个批次
+        embeddings = self.get_text_embeddings([e[0] for e in entities])
+        for (_, _, properties), embedding in zip(entities, embeddings):
+            properties['embedding'] = embedding
 
-        entities = list(seen_entities.values())
         return entities
 
     def _load_ner_model(self, model_path: str):
@@ -75,7 +83,7 @@ class EntityExtractor(BaseProcessor):
 
     def _load_finance_dict(self):
         """加载金融领域词典和实体类型映射"""
-        self.entity_patterns = {
+        raw_patterns = {
             'Company': [r'.*公司$', r'.*集团$', r'.*银行$', r'.*证券$'],
             'Industry': [r'.*行业$', r'.*板块$'],
             'Product': [r'.*基金$', r'.*股票$', r'.*期货$'],
@@ -83,6 +91,30 @@ class EntityExtractor(BaseProcessor):
             'Amount': [r'\d+\.?\d*[万亿]?[美]?元', r'\d+\.?\d*%'],
             'Person': [r'.*总经理$', r'.*董事长$', r'.*总裁$']
         }
+
+        # 预编译所有模式，避免每个文档重复编译
+        self.entity_patterns = {
+            entity_type: [re.compile(p) for p in patterns]
+            for entity_type, patterns in raw_patterns.items()
+        }
+        # $锚定的后缀模式单独保留：并进大正则后贪婪的.*会从行首
+        # 吃到行尾，把行内的时间/金额命中一并吞掉；这类模式每串
+        # 至多命中一次，逐个扫描几乎没有成本
+        self._anchored_patterns = [
+            (entity_type, pattern)
+            for entity_type, patterns in self.entity_patterns.items()
+            for pattern in patterns
+            if pattern.pattern.endswith('$')
+        ]
+        # 其余模式融合成一个带命名分组的大正则，整个文档只扫描一遍，
+        # 命中的分组名即实体类型
+        self._fused_pattern = re.compile('|'.join(
+            f'(?P<{entity_type}_{i}>{p})'
+            for entity_type, patterns in raw_patterns.items()
+            for i, p in enumerate(patterns)
+            if not p.endswith('$')
+        ))
+        self._number_pattern = re.compile(r'\d+\.?\d*')
         
         self.finance_terms = {
             "股票": "Product",
@@ -110,7 +142,7 @@ class EntityExtractor(BaseProcessor):
         # 遍历实体模式判断类型
         for entity_type, patterns in self.entity_patterns.items():
             for pattern in patterns:
-                if re.match(pattern, text):
+                if pattern.match(text):
                     return entity_type
         return None
 
@@ -132,9 +164,6 @@ class EntityExtractor(BaseProcessor):
             properties['value'] = self._normalize_amount(entity_text)
             properties['unit'] = self._extract_amount_unit(entity_text)
         
-        # 添加实体向量表示
-        properties['embedding'] = self.get_text_embedding(entity_text)
-        
         return properties
 
     def _extract_stock_code(self, company_name: str) -> str:
@@ -160,7 +189,7 @@ class EntityExtractor(BaseProcessor):
     def _normalize_amount(self, amount_text: str) -> float:
         """标准化金额"""
         # 移除非数字
-        num = re.findall(r'\d+\.?\d*', amount_text)[0]
+        num = self._number_pattern.findall(amount_text)[0]
         value = float(num)
         
         # re
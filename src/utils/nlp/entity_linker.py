@@ -1,8 +1,14 @@
 from typing import List, Tuple, Dict, Set
 from collections import defaultdict
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from .base_processor import BaseProcessor
+from .structures import Relation
+
+# faiss可选，未安装时退回numpy矩阵乘法
+try:
+    import faiss
+except ImportError:
+    faiss = None
 
 class EntityLinker(BaseProcessor):
     def __init__(self):
@@ -11,7 +17,13 @@ class EntityLinker(BaseProcessor):
         self.entity_aliases = defaultdict(set)
         self.entity_descriptions = {}
         self.entity_embeddings = {}
-        
+
+        # 归一化后的向量矩阵及对应名称，词典变化后惰性重建
+        self._emb_matrix = None
+        self._emb_keys = []
+        self._emb_dirty = True
+        self._faiss_index = None
+
         # 加载实体别名词典(换成自己的，最好存成数据库的同义词table)
         self._load_entity_aliases()
 
@@ -26,11 +38,21 @@ class EntityLinker(BaseProcessor):
             # 更多实体别名...
         }
         
-        # 实体嵌入
+        # 展平成 别名->规范名 的哈希表，精确匹配O(1)
+        self._alias_to_canonical = {}
         for canonical, aliases in self.entity_aliases.items():
-            self.entity_embeddings[canonical] = self.get_text_embedding(canonical)
+            self._alias_to_canonical[canonical] = canonical
             for alias in aliases:
-                self.entity_embeddings[alias] = self.get_text_embedding(alias)
+                self._alias_to_canonical[alias] = canonical
+
+        # 实体嵌入，所有名称一个批次算完
+        names = []
+        for canonical, aliases in self.entity_aliases.items():
+            names.append(canonical)
+            names.extend(aliases)
+        embeddings = self.get_text_embeddings(names)
+        for name, embedding in zip(names, embeddings):
+            self.entity_embeddings[name] = embedding
 
     def link_entities(self, entities: List[Tuple[str, str, Dict]]) -> List[Tuple[str, str, str, Dict]]:
         """实体链接"""
@@ -49,7 +71,7 @@ class EntityLinker(BaseProcessor):
                     'source': 'entity_linking',
                     'alias_type': 'standard_name'
                 }
-                linked_relations.append((
+                linked_relations.append(Relation(
                     entity,
                     "别名关系",
                     canonical_entity,
@@ -58,29 +80,59 @@ class EntityLinker(BaseProcessor):
         
         return linked_relations
 
+    def _rebuild_embedding_matrix(self):
+        """把所有实体向量堆叠成归一化矩阵，模糊匹配只需一次矩阵乘法"""
+        self._emb_keys = list(self.entity_embeddings.keys())
+        if self._emb_keys:
+            matrix = np.stack([self.entity_embeddings[k] for k in self._emb_keys])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            # 连续float32布局，BLAS/faiss无需再拷贝
+            self._emb_matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+        else:
+            self._emb_matrix = None
+
+        # 有faiss时建内积索引，SIMD内核比numpy更快且支持更大的词典
+        if faiss is not None and self._emb_matrix is not None:
+            self._faiss_index = faiss.IndexFlatIP(self._emb_matrix.shape[1])
+            self._faiss_index.add(self._emb_matrix)
+        else:
+            self._faiss_index = None
+        self._emb_dirty = False
+
     def _link_entity(self, entity_text: str) -> str:
         """实体链接"""
         # 1. 精确匹配
-        for canonical, aliases in self.entity_aliases.items():
-            if entity_text in aliases or entity_text == canonical:
-                return canonical
-        
+        canonical = self._alias_to_canonical.get(entity_text)
+        if canonical:
+            return canonical
+
         # 2. 模糊
+        if self._emb_dirty:
+            self._rebuild_embedding_matrix()
+        if self._emb_matrix is None:
+            return entity_text
+
         entity_embedding = self.get_text_embedding(entity_text)
-        max_similarity = 0
-        best_match = None
-        
-        for canonical, embedding in self.entity_embeddings.items():
-            similarity = cosine_similarity(
-                entity_embedding.reshape(1, -1),
-                embedding.reshape(1, -1)
-            )[0][0]
-            
-            if similarity > 0.9 and similarity > max_similarity:
-                max_similarity = similarity
-                best_match = canonical
-        
-        return best_match if best_match else entity_text
+        norm = np.linalg.norm(entity_embedding)
+        if norm == 0:
+            return entity_text
+
+        query = (entity_embedding / norm).astype('float32')
+        if self._faiss_index is not None:
+            # faiss内积检索，单位向量下即余弦相似度
+            distances, indices = self._faiss_index.search(query[None], 1)
+            if distances[0, 0] > 0.9:
+                return self._emb_keys[int(indices[0, 0])]
+            return entity_text
+
+        # 一次矩阵乘法算出与所有实体的余弦相似度
+        similarities = self._emb_matrix @ query
+        best_idx = int(np.argmax(similarities))
+        if similarities[best_idx] > 0.9:
+            return self._emb_keys[best_idx]
+
+        return entity_text
 
     def get_canonical_name(self, entity_text: str) -> str:
         """获取实体的规范名称"""
@@ -94,7 +146,10 @@ class EntityLinker(BaseProcessor):
     def add_alias(self, canonical: str, alias: str):
         """添加新的实体别名"""
         self.entity_aliases[canonical].add(alias)
+        self._alias_to_canonical[alias] = canonical
+        self._alias_to_canonical.setdefault(canonical, canonical)
         self.entity_embeddings[alias] = self.get_text_embedding(alias)
+        self._emb_dirty = True
 
     def merge_entities(self, entity1: str, entity2: str):
         """合并两个实体（当发现它们实际上是同一个实体时）"""
@@ -107,5 +162,8 @@ class EntityLinker(BaseProcessor):
             # 删除旧的
             del self.entity_aliases[canonical2]
             # update
+            self._alias_to_canonical[canonical2] = canonical1
             for alias in self.entity_aliases[canonical1]:
-                self.entity_embeddings[alias] = self.get_text_embedding(alias) 
\ No newline at end of file
+                self._alias_to_canonical[alias] = canonical1
+                self.entity_embeddings[alias] = self.get_text_embedding(alias)
+            self._emb_dirty = True 
\ No newline at end of file
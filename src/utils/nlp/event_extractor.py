@@ -1,12 +1,15 @@
+import re
 import jieba
 import jieba.posseg as pseg
+from bisect import bisect_left, bisect_right
 from typing import List, Dict, Tuple
+from .doc_context import DocContext
 
 class EventExtractor:
     def __init__(self):
         """初始化事件抽取器"""
         jieba.initialize()
-        
+
         # 事件触发词
         self.event_triggers = {
             '投资事件': ['投资', '收购', '入股', '融资'],
@@ -16,16 +19,44 @@ class EventExtractor:
             '财务事件': ['营收', '利润', '亏损', '增长']
         }
 
-    def extract_events(self, text: str, entities: List[Tuple[str, str, Dict]]) -> List[Dict]:
-        """从文本中抽取事件"""
+        # 预编译时间模式，避免每次抽取重复编译
+        self.time_patterns = [
+            re.compile(p) for p in [
+                r'\d{4}年\d{1,2}月\d{1,2}日',
+                r'\d{4}年\d{1,2}月',
+                r'\d{4}年',
+                r'\d{1,2}月\d{1,2}日'
+            ]
+        ]
+
+    def extract_events(self, doc, entities: List[Tuple[str, str, Dict]]) -> List[Dict]:
+        """从文本中抽取事件
+
+        Args:
+            doc: 输入文本或已构建的DocContext（复用分词结果）
+            entities: 实体列表
+        """
+        ctx = DocContext.ensure(doc)
+        text = ctx.text
         events = []
-        words = list(pseg.cut(text))
 
-        for i, (word, flag) in enumerate(words):
+        # 预先定位所有实体并按位置排序，之后每个触发词用二分查窗口；
+        # 与分词一致的实体直接查偏移表，其余才退回text.find
+        entity_positions = []
+        for entity, entity_type, _ in entities:
+            pos = ctx.word_offsets.get(entity)
+            if pos is None:
+                pos = text.find(entity)
+            if pos != -1:
+                entity_positions.append((pos, entity, entity_type))
+        entity_positions.sort()
+
+        # 上下文中带有每个词的真实偏移，无需反复text.find
+        for (word, flag), offset in zip(ctx.pseg_tokens, ctx.positions):
             event_type = self._check_trigger_word(word)
             if event_type:
                 # 事件参与者
-                participants = self._find_event_participants(text, word, entities)
+                participants = self._find_event_participants(offset, entity_positions)
 
                 event = {
                     'type': event_type,
@@ -33,12 +64,12 @@ class EventExtractor:
                     'participants': participants
                 }
 
-                time_info = self._extract_time_info(text, word)
+                time_info = self._extract_time_info(text, offset)
                 if time_info:
                     event['time'] = time_info
-                
+
                 events.append(event)
-        
+
         return events
 
     def _check_trigger_word(self, word: str) -> str:
@@ -48,33 +79,30 @@ class EventExtractor:
                 return event_type
         return None
 
-    def _find_event_participants(self, text: str, trigger: str, entities: List[Tuple[str, str, Dict]]) -> Dict:
-        """找到事件的参与者"""
+    def _find_event_participants(self, trigger_pos: int, entity_positions: List[Tuple[int, str, str]]) -> Dict:
+        """找到事件的参与者
+
+        Args:
+            trigger_pos: 触发词在文本中的位置
+            entity_positions: 按位置排序的 (位置, 实体, 实体类型) 列表
+        """
         participants = {}
-        trigger_pos = text.find(trigger)
-        
-        if trigger_pos == -1:
-            return participants
-        
-        # 在触发词前后的窗口中查找实体
+
+        # 二分定位触发词前后窗口内的实体
         window_size = 50
-        
-        for entity, entity_type, props in entities:
-            entity_pos = text.find(entity)
-            if entity_pos == -1:
-                continue
-            
-            # 如果实体在触发词的合适距离内
-            if abs(entity_pos - trigger_pos) <= window_size:
-                # 根据实体类型和位置确定角色
-                if entity_pos < trigger_pos:
-                    role = self._determine_role(entity_type, 'subject')
-                else:
-                    role = self._determine_role(entity_type, 'object')
-                
-                if role:
-                    participants[role] = entity
-        
+        lo = bisect_left(entity_positions, (trigger_pos - window_size,))
+        hi = bisect_right(entity_positions, (trigger_pos + window_size + 1,))
+
+        for entity_pos, entity, entity_type in entity_positions[lo:hi]:
+            # 根据实体类型和位置确定角色
+            if entity_pos < trigger_pos:
+                role = self._determine_role(entity_type, 'subject')
+            else:
+                role = self._determine_role(entity_type, 'object')
+
+            if role:
+                participants[role] = entity
+
         return participants
 
     def _determine_role(self, entity_type: str, position: str) -> str:
@@ -96,27 +124,14 @@ class EventExtractor:
         
         return role_mapping.get(entity_type, {}).get(position, None)
 
-    def _extract_time_info(self, text: str, trigger: str) -> str:
-        """提取时间信息"""
-        # re
-        time_patterns = [
-            r'\d{4}年\d{1,2}月\d{1,2}日',
-            r'\d{4}年\d{1,2}月',
-            r'\d{4}年',
-            r'\d{1,2}月\d{1,2}日'
-        ]
-        
-        trigger_pos = text.find(trigger)
-        if trigger_pos == -1:
-            return None
-        
+    def _extract_time_info(self, text: str, trigger_pos: int) -> str:
+        """提取触发词附近的时间信息"""
         window_size = 50
         window_text = text[max(0, trigger_pos - window_size):min(len(text), trigger_pos + window_size)]
-        
-        import re
-        for pattern in time_patterns:
-            match = re.search(pattern, window_text)
+
+        for pattern in self.time_patterns:
+            match = pattern.search(window_text)
             if match:
                 return match.group()
-        
+
         return None 
\ No newline at end of file
@@ -1,6 +1,9 @@
 from typing import List, Tuple, Dict
 from collections import defaultdict
+import json
+import pickle
 import networkx as nx
+import numpy as np
 from .base_processor import BaseProcessor
 
 class KnowledgeGraph(BaseProcessor):
@@ -9,6 +12,10 @@ class KnowledgeGraph(BaseProcessor):
         super().__init__()
         self.graph = nx.DiGraph()
         self.relation_types = set()
+        # 节点向量缓存，同一节点只嵌入一次
+        self._emb_cache = {}
+        # 边的SoA镜像（平行数组+CSR索引），图变更后惰性重建
+        self._edge_table = None
 
     def add_relations(self, relations: List[Tuple[str, str, str, Dict]]):
         """添加关系到知识图谱"""
@@ -20,35 +27,97 @@ class KnowledgeGraph(BaseProcessor):
                 properties=props
             )
             self.relation_types.add(relation_type)
+        self._edge_table = None
+
+    def _build_edge_table(self) -> Dict:
+        """把边镜像成SoA平行数组并建CSR索引
+
+        每条边只占几个定长整数槽位，读密集的查询在连续内存上
+        做切片，不再逐边遍历字典。nx.DiGraph仍是权威存储，
+        只服务路径/子图等算法调用
+        """
+        node_names = list(self.graph.nodes())
+        node_ids = {name: i for i, name in enumerate(node_names)}
+        rel_names = sorted(self.relation_types)
+        rel_ids = {name: i for i, name in enumerate(rel_names)}
+
+        edge_count = self.graph.number_of_edges()
+        heads = np.empty(edge_count, dtype=np.int32)
+        tails = np.empty(edge_count, dtype=np.int32)
+        rels = np.empty(edge_count, dtype=np.int16)
+        props = []
+        for i, (head, tail, data) in enumerate(self.graph.edges(data=True)):
+            heads[i] = node_ids[head]
+            tails[i] = node_ids[tail]
+            rels[i] = rel_ids[data['relation_type']]
+            props.append(data['properties'])
+
+        # CSR：按端点排序的边下标 + 每个节点的切片边界
+        node_range = np.arange(len(node_names) + 1)
+        out_order = np.argsort(heads, kind='stable')
+        out_indptr = np.searchsorted(heads[out_order], node_range)
+        in_order = np.argsort(tails, kind='stable')
+        in_indptr = np.searchsorted(tails[in_order], node_range)
+
+        self._edge_table = {
+            'node_names': node_names,
+            'node_ids': node_ids,
+            'rel_names': rel_names,
+            'heads': heads,
+            'tails': tails,
+            'rels': rels,
+            'props': props,
+            'out': (out_order, out_indptr),
+            'in': (in_order, in_indptr)
+        }
+        return self._edge_table
 
     def get_relations(self, entity: str) -> List[Tuple[str, str, str, Dict]]:
         """获取实体的所有关系"""
-        relations = []
-        
-        # 获取出边（实体作为头实体的关系）
-        for _, tail, data in self.graph.out_edges(entity, data=True):
-            relations.append((
-                entity,
-                data['relation_type'],
-                tail,
-                data['properties']
-            ))
-        
-        # 获取入边（实体作为尾实体的关系）
-        for head, _, data in self.graph.in_edges(entity, data=True):
-            relations.append((
-                head,
-                data['relation_type'],
-                entity,
-                data['properties']
-            ))
-        
+        table = self._edge_table or self._build_edge_table()
+        node_id = table['node_ids'].get(entity)
+        if node_id is None:
+            return []
+
+        node_names = table['node_names']
+        rel_names = table['rel_names']
+        tails, rels, props = table['tails'], table['rels'], table['props']
+
+        # 出边（实体作为头实体的关系）+ 入边（实体作为尾实体的关系）
+        out_order, out_indptr = table['out']
+        relations = [
+            (entity, rel_names[rels[i]], node_names[tails[i]], props[i])
+            for i in out_order[out_indptr[node_id]:out_indptr[node_id + 1]]
+        ]
+        in_order, in_indptr = table['in']
+        heads = table['heads']
+        relations.extend(
+            (node_names[heads[i]], rel_names[rels[i]], entity, props[i])
+            for i in in_order[in_indptr[node_id]:in_indptr[node_id + 1]]
+        )
+
         return relations
 
-    def query_relation_path(self, entity1: str, entity2: str, max_depth: int = 2) -> List[Dict]:
-        """查询两个实体之间的关系路径"""
+    def query_relation_path(self, entity1: str, entity2: str, max_depth: int = 2,
+                            max_paths: int = 100) -> List[Dict]:
+        """查询两个实体之间的关系路径
+
+        Args:
+            entity1: 头实体
+            entity2: 尾实体
+            max_depth: 路径最大长度
+            max_paths: 最多返回的路径数，防止稠密图上路径枚举爆炸
+        """
         relations = []
-        
+        if entity1 not in self.graph or entity2 not in self.graph:
+            return relations
+
+        # 先用有界BFS确认可达，够不着就不做昂贵的路径枚举
+        lengths = nx.single_source_shortest_path_length(
+            self.graph, entity1, cutoff=max_depth)
+        if entity2 not in lengths:
+            return relations
+
         # 两个实体的直接关系
         if self.graph.has_edge(entity1, entity2):
             edge_data = self.graph.get_edge_data(entity1, entity2)
@@ -57,70 +126,161 @@ class KnowledgeGraph(BaseProcessor):
                 'path': [entity1, entity2],
                 'properties': edge_data['properties']
             })
-        
+
         # 间接
-        for path in nx.all_simple_paths(self.graph, entity1, entity2, cutoff=max_depth):
+        for path in self._bidir_paths(entity1, entity2, max_depth):
+            if len(path) == 2:
+                continue  # 直接边已在上面报告过，不重复输出
             path_relations = []
             path_properties = []
-            
+
             for i in range(len(path) - 1):
                 edge_data = self.graph.get_edge_data(path[i], path[i + 1])
                 path_relations.append(edge_data['relation_type'])
                 path_properties.append(edge_data['properties'])
-            
+
             relations.append({
                 'type': '->'.join(path_relations),
                 'path': path,
                 'properties': path_properties
             })
-        
+            if len(relations) >= max_paths:
+                break
+
         return relations
 
+    def _bidir_paths(self, src: str, dst: str, cutoff: int):
+        """双向搜索两端点间的简单路径（路径长度不超过cutoff条边）
+
+        从src正向、从dst反向各扩展约一半深度后在中间会合，
+        分支因子开方级地低于单向的all_simple_paths
+        """
+        if cutoff < 1 or src == dst:
+            return
+
+        forward_depth = (cutoff + 1) // 2
+        backward_depth = cutoff - forward_depth
+
+        # 正向：src出发的简单路径，按末端节点分组
+        forward = defaultdict(list)
+        stack = [(src, [src])]
+        while stack:
+            node, path = stack.pop()
+            forward[node].append(path)
+            if len(path) - 1 < forward_depth:
+                for succ in self.graph.successors(node):
+                    if succ not in path:
+                        stack.append((succ, path + [succ]))
+
+        # 反向：到达dst的简单路径，按起端节点分组
+        backward = defaultdict(list)
+        stack = [(dst, [dst])]
+        while stack:
+            node, path = stack.pop()
+            backward[node].append(path)
+            if len(path) - 1 < backward_depth:
+                for pred in self.graph.predecessors(node):
+                    if pred not in path:
+                        stack.append((pred, [pred] + path))
+
+        # 在会合点拼接两段，去掉节点重复的和拼过的
+        seen = set()
+        for meet, forward_paths in forward.items():
+            backward_paths = backward.get(meet)
+            if not backward_paths:
+                continue
+            for fpath in forward_paths:
+                fpath_nodes = set(fpath)
+                for bpath in backward_paths:
+                    if len(fpath) + len(bpath) - 2 > cutoff:
+                        continue
+                    if fpath_nodes & (set(bpath) - {meet}):
+                        continue  # 非简单路径
+                    full = fpath + bpath[1:]
+                    if len(full) < 2:
+                        continue
+                    key = tuple(full)
+                    if key not in seen:
+                        seen.add(key)
+                        yield full
+
     def get_subgraph(self, entity: str, depth: int = 1) -> nx.DiGraph:
         """获取以实体为中心的子图"""
-        nodes = {entity}
-        for _ in range(depth):
-            new_nodes = set()
-            for node in nodes:
-                new_nodes.update(self.graph.predecessors(node))
-                new_nodes.update(self.graph.successors(node))
-            nodes.update(new_nodes)
-        
+        # 无向视图上做一次有界BFS，已访问节点不再重复扩展
+        undirected = self.graph.to_undirected(as_view=True)
+        nodes = set(nx.single_source_shortest_path_length(
+            undirected, entity, cutoff=depth))
+
         return self.graph.subgraph(nodes)
 
     def get_entity_statistics(self, entity: str) -> Dict:
         """获取实体的统计信息"""
+        table = self._edge_table or self._build_edge_table()
+        node_id = table['node_ids'].get(entity)
+        if node_id is None:
+            return {
+                'degree': 0,
+                'in_degree': 0,
+                'out_degree': 0,
+                'relation_types': defaultdict(int)
+            }
+
+        # CSR切片边界直接给出度数，不用数边
+        out_order, out_indptr = table['out']
+        in_order, in_indptr = table['in']
+        out_degree = int(out_indptr[node_id + 1] - out_indptr[node_id])
+        in_degree = int(in_indptr[node_id + 1] - in_indptr[node_id])
         stats = {
-            'degree': self.graph.degree(entity),
-            'in_degree': self.graph.in_degree(entity),
-            'out_degree': self.graph.out_degree(entity),
+            'degree': out_degree + in_degree,
+            'in_degree': in_degree,
+            'out_degree': out_degree,
             'relation_types': defaultdict(int)
         }
 
-        for _, _, data in self.graph.out_edges(entity, data=True):
-            stats['relation_types'][data['relation_type']] += 1
-        for _, _, data in self.graph.in_edges(entity, data=True):
-            stats['relation_types'][data['relation_type']] += 1
-        
+        rels, rel_names = table['rels'], table['rel_names']
+        edge_ids = np.concatenate([
+            out_order[out_indptr[node_id]:out_indptr[node_id + 1]],
+            in_order[in_indptr[node_id]:in_indptr[node_id + 1]]
+        ])
+        for rel_id, count in zip(*np.unique(rels[edge_ids], return_counts=True)):
+            stats['relation_types'][rel_names[rel_id]] = int(count)
+
         return stats
 
+    def _node_embedding(self, entity: str) -> np.ndarray:
+        """取节点向量，带缓存"""
+        embedding = self._emb_cache.get(entity)
+        if embedding is None:
+            embedding = self.get_text_embedding(entity)
+            self._emb_cache[entity] = embedding
+        return embedding
+
     def find_similar_entities(self, entity: str, top_k: int = 5) -> List[Tuple[str, float]]:
         """查找与给定实体相似的实体"""
         if entity not in self.graph:
             return []
-        
-        similarities = []
-        entity_embedding = self.get_text_embedding(entity)
-        
-        for other_entity in self.graph.nodes():
-            if other_entity != entity:
-                other_embedding = self.get_text_embedding(other_entity)
-                similarity = self.calculate_similarity(entity_embedding, other_embedding)
-                similarities.append((other_entity, similarity))
-        
-        # top_k个
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:top_k]
+
+        nodes = [n for n in self.graph.nodes() if n != entity]
+        if not nodes:
+            return []
+
+        # 未缓存的节点一个批次嵌入完
+        missing = [n for n in nodes if n not in self._emb_cache]
+        if missing:
+            for name, embedding in zip(missing, self.get_text_embeddings(missing)):
+                self._emb_cache[name] = embedding
+
+        # 一次矩阵乘法算出所有相似度（向量已归一化）
+        matrix = np.stack([self._emb_cache[n] for n in nodes])
+        similarities = matrix @ self._node_embedding(entity)
+
+        # top_k个，argpartition先选出再排序，避免对全量排序
+        if top_k < len(nodes):
+            candidates = np.argpartition(-similarities, top_k)[:top_k]
+        else:
+            candidates = np.arange(len(nodes))
+        order = candidates[np.argsort(-similarities[candidates])]
+        return [(nodes[i], float(similarities[i])) for i in order]
 
     def merge_entities(self, entity1: str, entity2: str):
         """合并两个实体节点（当它们表示相同实体时）"""
@@ -128,25 +288,72 @@ class KnowledgeGraph(BaseProcessor):
             return
         
         # 将entity2的所有边转移到entity1
-        for pred in self.graph.predecessors(entity2):
-            edge_data = self.graph.get_edge_data(pred, entity2)
-            self.graph.add_edge(pred, entity1, **edge_data)
-        
-        for succ in self.graph.successors(entity2):
-            edge_data = self.graph.get_edge_data(entity2, succ)
-            self.graph.add_edge(entity1, succ, **edge_data)
-        
+        # 邻接视图里已带边属性，免去逐边get_edge_data的重复查找
+        pred = self.graph.pred.get(entity2, {})
+        succ = self.graph.succ.get(entity2, {})
+        self.graph.add_edges_from(
+            (p, entity1, data) for p, data in pred.items())
+        self.graph.add_edges_from(
+            (entity1, s, data) for s, data in succ.items())
+
         # 删除entity2节点
         self.graph.remove_node(entity2)
+        self._emb_cache.pop(entity2, None)
+        self._edge_table = None
 
     def save_graph(self, filepath: str):
         """保存知识图谱"""
-        nx.write_gpickle(self.graph, filepath)
+        # 存SoA平行数组的压缩npz：定长整数列远小于gpickle
+        # 逐边pickle的字典，gpickle在networkx 3.0后也已移除
+        table = self._edge_table or self._build_edge_table()
+        with open(filepath, 'wb') as f:
+            np.savez_compressed(
+                f,
+                node_names=np.array(table['node_names']),
+                rel_names=np.array(table['rel_names']),
+                heads=table['heads'],
+                tails=table['tails'],
+                rels=table['rels'],
+                props=np.array([
+                    json.dumps(props, ensure_ascii=False)
+                    for props in table['props']
+                ])
+            )
 
     def load_graph(self, filepath: str):
         """加载知识图谱"""
-        self.graph = nx.read_gpickle(filepath)
-        self.relation_types = {
-            data['relation_type']
-            for _, _, data in self.graph.edges(data=True)
-        } 
\ No newline at end of file
+        try:
+            data = np.load(filepath)
+        except Exception:
+            # 兼容旧版gpickle存档：其内容就是graph对象的pickle，
+            # 直接反序列化，不依赖networkx 3.0已移除的read_gpickle
+            try:
+                with open(filepath, 'rb') as f:
+                    graph = pickle.load(f)
+            except Exception as e:
+                raise ValueError(f"无法读取图谱文件{filepath}: {str(e)}") from e
+            if not isinstance(graph, nx.Graph):
+                raise ValueError(f"图谱文件{filepath}不是有效的npz或gpickle存档")
+            self.graph = graph
+            self._edge_table = None
+            self.relation_types = {
+                data['relation_type']
+                for _, _, data in self.graph.edges(data=True)
+            }
+            return
+
+        node_names = data['node_names'].tolist()
+        rel_names = data['rel_names'].tolist()
+        graph = nx.DiGraph()
+        graph.add_nodes_from(node_names)
+        for head, tail, rel, props in zip(
+                data['heads'], data['tails'], data['rels'], data['props']):
+            graph.add_edge(
+                node_names[head],
+                node_names[tail],
+                relation_type=rel_names[rel],
+                properties=json.loads(props)
+            )
+        self.graph = graph
+        self.relation_types = set(rel_names)
+        self._edge_table = None
\ No newline at end of file
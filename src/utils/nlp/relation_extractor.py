@@ -1,29 +1,35 @@
 import re
 from typing import List, Tuple, Dict, Set
+from bisect import bisect_right
 from collections import defaultdict
+from datetime import datetime
+from itertools import combinations
 import jieba
-import jieba.posseg as pseg
-from transformers import BertTokenizer, BertModel
-import torch
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from .base_processor import BaseProcessor
+from .structures import Relation
 
 class RelationExtractor(BaseProcessor):
+    # 关系触发词
+    RELATION_TRIGGERS = frozenset({'投资', '收购', '合作', '签署', '发布', '研发'})
+
+    # 可由实体类型直接推断的关系
+    TYPE_RELATION_MAP = {
+        ('Company', 'Company'): '合作关系',
+        ('Person', 'Company'): '任职关系',
+        ('Company', 'Product'): '产品关系',
+        ('Company', 'Industry'): '所属行业',
+    }
+
     def __init__(self):
         """初始化关系抽取器"""
+        # BERT模型由BaseProcessor统一加载并在抽取器间共享
         super().__init__()
-        # 加载BERT模型
-        try:
-            self.tokenizer = BertTokenizer.from_pretrained('bert-base-chinese')
-            self.model = BertModel.from_pretrained('bert-base-chinese')
-        except:
-            print("BERT模型未安装")
-            self.tokenizer = None
-            self.model = None
 
         jieba.initialize()
 
+        # extract_relations调用期间复用的时间戳
+        self._call_timestamp = None
+
         # 写的较简单
         self._load_relation_patterns()
 
@@ -39,21 +45,27 @@ class RelationExtractor(BaseProcessor):
         relations = []
         entity_texts = {e[0] for e in entities}
         entity_dict = {e[0]: e for e in entities}
-        
+
+        # 本次调用内所有关系共用同一时间戳，不必每条都strftime
+        self._call_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        # 每个实体的全部出现位置只扫描一次，后面的两两比较直接查表
+        entity_positions = self._locate_entities(text, entity_texts)
+
         # 1. 基于BERT的关系分类
         bert_relations = self._extract_bert_relations(text, entities)
         relations.extend(bert_relations)
-        
+
         # 2. 基于模板的关系抽取
         template_relations = self._extract_template_relations(text, entity_texts, entity_dict)
         relations.extend(template_relations)
-        
+
         # 3. 基于依存句法的关系抽取
-        dependency_relations = self._extract_dependency_relations(text, entity_texts, entity_dict)
+        dependency_relations = self._extract_dependency_relations(text, entity_texts, entity_dict, entity_positions)
         relations.extend(dependency_relations)
-        
+
         # 4. 基于共现的关系发现
-        cooccurrence_relations = self._extract_cooccurrence_relations(text, entities)
+        cooccurrence_relations = self._extract_cooccurrence_relations(text, entities, entity_positions)
         relations.extend(cooccurrence_relations)
         
         # 5. 关系验证和去重
@@ -62,156 +74,192 @@ class RelationExtractor(BaseProcessor):
         return relations
 
     def _load_relation_patterns(self):
-        """加载关系抽取模板"""
+        """加载关系抽取模板（预编译，避免每次调用重复编译）"""
         self.relation_patterns = {
-            "投资关系": [
-                r"(\w+)(?:投资|收购|入股)(\w+)",
-                r"(\w+)(?:获得|接受)(\w+)(?:投资|收购)",
-            ],
-            "合作关系": [
-                r"(\w+)(?:与|和|同)(\w+)(?:合作|签署|达成)",
-                r"(\w+)(?:携手|联合)(\w+)",
-            ],
-            "从属关系": [
-                r"(\w+)(?:是|为)(\w+)(?:的子公司|的分支)",
-                r"(\w+)(?:隶属于|属于)(\w+)",
-            ],
-            "竞争关系": [
-                r"(\w+)(?:与|和)(\w+)(?:竞争|争夺)",
-                r"(\w+)(?:是|为)(\w+)(?:的竞争对手|的对手)",
-            ],
-            "供应关系": [
-                r"(\w+)(?:为|给)(\w+)(?:供应|提供)",
-                r"(\w+)(?:采购|购买)(\w+)(?:的产品|的服务)",
-            ]
+            relation_type: [re.compile(p) for p in patterns]
+            for relation_type, patterns in {
+                "投资关系": [
+                    r"(\w+)(?:投资|收购|入股)(\w+)",
+                    r"(\w+)(?:获得|接受)(\w+)(?:投资|收购)",
+                ],
+                "合作关系": [
+                    r"(\w+)(?:与|和|同)(\w+)(?:合作|签署|达成)",
+                    r"(\w+)(?:携手|联合)(\w+)",
+                ],
+                "从属关系": [
+                    r"(\w+)(?:是|为)(\w+)(?:的子公司|的分支)",
+                    r"(\w+)(?:隶属于|属于)(\w+)",
+                ],
+                "竞争关系": [
+                    r"(\w+)(?:与|和)(\w+)(?:竞争|争夺)",
+                    r"(\w+)(?:是|为)(\w+)(?:的竞争对手|的对手)",
+                ],
+                "供应关系": [
+                    r"(\w+)(?:为|给)(\w+)(?:供应|提供)",
+                    r"(\w+)(?:采购|购买)(\w+)(?:的产品|的服务)",
+                ]
+            }.items()
         }
 
+        # 把所有模板融合成一个带命名分组的大正则，整个文本只扫描一遍；
+        # 记录每个分支对应的关系类型和头/尾实体的组号
+        parts = []
+        self._union_branches = {}
+        group_count = 0
+        branch = 0
+        for relation_type, patterns in self.relation_patterns.items():
+            for pattern in patterns:
+                name = f'r{branch}'
+                parts.append(f'(?P<{name}>{pattern.pattern})')
+                self._union_branches[name] = (
+                    relation_type, group_count + 2, group_count + 3)
+                group_count += 1 + pattern.groups
+                branch += 1
+        self._union_pattern = re.compile('|'.join(parts))
+
     def _extract_bert_relations(self, text: str, entities: List[Tuple[str, str, Dict]]) -> List[Tuple[str, str, str, Dict]]:
         """使用BERT模型进行关系分类"""
         if not self.model or not self.tokenizer:
             return []
-            
+        if len(entities) < 2:
+            return []
+
+        # 每个实体只做一次前向，相似度由一次矩阵乘法得到；
+        # 旧实现对序列自身算余弦（恒为1），N²次前向全是浪费
+        unique_entities = list(dict.fromkeys(e[0] for e in entities))
+        embeddings = self.get_text_embeddings(unique_entities)  # 已归一化
+        entity_index = {name: i for i, name in enumerate(unique_entities)}
+        similarity_matrix = embeddings @ embeddings.T
+
+        # 按类型分桶，只枚举TYPE_RELATION_MAP里可推断的类型对，
+        # 其余组合在原N²循环里反正也会被丢弃
+        by_type = defaultdict(list)
+        for entity_text, entity_type, _ in entities:
+            by_type[entity_type].append(entity_text)
+
+        candidate_pairs = []
+        for (type1, type2), relation_type in self.TYPE_RELATION_MAP.items():
+            if type1 == type2:
+                candidate_pairs.extend(
+                    (e1, e2, relation_type)
+                    for e1, e2 in combinations(by_type.get(type1, []), 2))
+            else:
+                candidate_pairs.extend(
+                    (e1, e2, relation_type)
+                    for e1 in by_type.get(type1, [])
+                    for e2 in by_type.get(type2, []))
+
         bert_relations = []
-        
-        for i, (entity1, type1, props1) in enumerate(entities):
-            for j, (entity2, type2, props2) in enumerate(entities[i+1:], i+1):
-                # 构建输入序列
-                sequence = f"{entity1}[SEP]{entity2}"
-                inputs = self.tokenizer(
-                    sequence,
-                    return_tensors="pt",
-                    padding=True,
-                    truncation=True
-                )
-                
-                # 获取BERT表示
-                with torch.no_grad():
-                    outputs = self.model(**inputs)
-                    # 使用最后一层的[CLS]标记的输出作为序列表示
-                    sequence_embedding = outputs.last_hidden_state[:, 0, :]  # [batch_size, hidden_size]
-                    
-                    # similarity启发式方法
-                    if type1 == type2:  # 同类型实体
-                        similarity = float(torch.cosine_similarity(
-                            sequence_embedding,
-                            sequence_embedding
-                        ).item())
-                        
-                        if similarity > 0.8:  # 相似度阈值
-                            # 根据实体类型确定关系
-                            relation_type = self._infer_relation_by_types(type1, type2)
-                            if relation_type:
-                                properties = {
-                                    'confidence': float(similarity),
-                                    'method': 'bert_similarity',
-                                    'context': str(self.get_context_window(text, text.find(entity1), text.find(entity2)))
-                                }
-                                bert_relations.append((entity1, relation_type, entity2, properties))
-        
+        for entity1, entity2, relation_type in candidate_pairs:
+            if entity1 == entity2:
+                continue
+            # similarity启发式方法
+            similarity = float(
+                similarity_matrix[entity_index[entity1], entity_index[entity2]])
+            if similarity > 0.8:  # 相似度阈值
+                properties = {
+                    'confidence': float(similarity),
+                    'method': 'bert_similarity',
+                    'context': str(self.get_context_window(text, text.find(entity1), text.find(entity2)))
+                }
+                bert_relations.append((entity1, relation_type, entity2, properties))
+
         return bert_relations
         
     def _infer_relation_by_types(self, type1: str, type2: str) -> str:
         """根据实体类型推断关系类型"""
-        type_relation_map = {
-            ('Company', 'Company'): '合作关系',
-            ('Person', 'Company'): '任职关系',
-            ('Company', 'Product'): '产品关系',
-            ('Company', 'Industry'): '所属行业',
-        }
-        
-        return type_relation_map.get((type1, type2)) or type_relation_map.get((type2, type1))
+        return (self.TYPE_RELATION_MAP.get((type1, type2))
+                or self.TYPE_RELATION_MAP.get((type2, type1)))
 
     def _extract_template_relations(self, text: str, entity_texts: Set[str], entity_dict: Dict) -> List[Tuple[str, str, str, Dict]]:
         """基于模板的关系抽取"""
         template_relations = []
-        
-        for relation_type, patterns in self.relation_patterns.items():
-            for pattern in patterns:
-                matches = re.finditer(pattern, text)
-                for match in matches:
-                    head = match.group(1)
-                    tail = match.group(2)
-                    if head in entity_texts and tail in entity_texts:
-                        #获取上下文窗口
-                        context = self.get_context_window(text, match.start(), match.end())
-                        #提取关系属性
-                        properties = self._extract_relation_properties(head, tail, relation_type, context)
-                        #添加实体类型信息
-                        properties['head_type'] = entity_dict[head][1]
-                        properties['tail_type'] = entity_dict[tail][1]
-                        template_relations.append((head, relation_type, tail, properties))
-        
+
+        # 单遍扫描融合后的大正则，命中的分支给出关系类型和实体组号
+        for match in self._union_pattern.finditer(text):
+            relation_type, head_group, tail_group = self._union_branches[match.lastgroup]
+            head = match.group(head_group)
+            tail = match.group(tail_group)
+            if head in entity_texts and tail in entity_texts:
+                #获取上下文窗口
+                context = self.get_context_window(text, match.start(), match.end())
+                #提取关系属性
+                properties = self._extract_relation_properties(head, tail, relation_type, context)
+                #添加实体类型信息
+                properties['head_type'] = entity_dict[head][1]
+                properties['tail_type'] = entity_dict[tail][1]
+                template_relations.append((head, relation_type, tail, properties))
+
         return template_relations
 
-    def _extract_dependency_relations(self, text: str, entity_texts: Set[str], entity_dict: Dict) -> List[Tuple[str, str, str, Dict]]:
+    def _locate_entities(self, text: str, entity_texts: Set[str]) -> Dict[str, List[int]]:
+        """一次性找出每个实体在文本中的全部出现位置（升序）"""
+        return {
+            entity: [m.start() for m in re.finditer(re.escape(entity), text)]
+            for entity in entity_texts
+        }
+
+    def _extract_dependency_relations(self, text: str, entity_texts: Set[str], entity_dict: Dict,
+                                      entity_positions: Dict[str, List[int]]) -> List[Tuple[str, str, str, Dict]]:
         """使用依存句法分析提取关系"""
         relations = []
-        words = pseg.cut(text)
-        
+
+        # 按句切分，只在同句共现的实体之间组对，把O(N²)候选裁剪到近线性
+        sentence_starts = [0]
+        for match in re.finditer(r'[。！？]', text):
+            sentence_starts.append(match.end())
+
+        sentence_entities = defaultdict(set)
+        for entity in entity_texts:
+            for pos in entity_positions.get(entity, []):
+                sentence_idx = bisect_right(sentence_starts, pos) - 1
+                sentence_entities[sentence_idx].add(entity)
+
         # 使用基于规则的方法提取关系
-        for entity1_text in entity_texts:
-            for entity2_text in entity_texts:
-                if entity1_text != entity2_text:  # 避免自反关系
-                    # 在这里添加基于词性和位置的规则
-                    if self._check_relation_pattern(text, entity1_text, entity2_text):
-                        relation_type = self._determine_relation_type(text, 
-                                                                    entity_dict[entity1_text], 
-                                                                    entity_dict[entity2_text])
-                        if relation_type:
-                            properties = {
-                                'confidence': 0.7,
-                                'method': 'dependency_rule',
-                                'context': self.get_context_window(text, 
-                                                                 text.find(entity1_text), 
-                                                                 text.find(entity2_text))
-                            }
-                            relations.append((entity1_text, relation_type, entity2_text, properties))
-        
+        seen_pairs = set()
+        for sentence_idx, sentence_ents in sentence_entities.items():
+            for entity1_text, entity2_text in combinations(sorted(sentence_ents), 2):
+                if (entity1_text, entity2_text) in seen_pairs:
+                    continue
+                seen_pairs.add((entity1_text, entity2_text))
+                # 在这里添加基于词性和位置的规则
+                if self._check_relation_pattern(text, entity1_text, entity2_text, entity_positions):
+                    relation_type = self._determine_relation_type(text,
+                                                                entity_dict[entity1_text],
+                                                                entity_dict[entity2_text],
+                                                                entity_positions)
+                    if relation_type:
+                        properties = {
+                            'confidence': 0.7,
+                            'method': 'dependency_rule',
+                            'context': self.get_context_window(text,
+                                                             entity_positions[entity1_text][0],
+                                                             entity_positions[entity2_text][0])
+                        }
+                        relations.append((entity1_text, relation_type, entity2_text, properties))
+
         return relations
 
-    def _check_relation_pattern(self, text, entity1, entity2):
+    def _check_relation_pattern(self, text, entity1, entity2, entity_positions):
         """检查两个实体之间是否存在关系模式"""
-        # 获取实体在文本中的位置
-        pos1 = text.find(entity1)
-        pos2 = text.find(entity2)
-        
-        if pos1 == -1 or pos2 == -1:
+        # 从预计算的位置表取实体位置
+        positions1 = entity_positions.get(entity1)
+        positions2 = entity_positions.get(entity2)
+        if not positions1 or not positions2:
             return False
+        pos1, pos2 = positions1[0], positions2[0]
 
         between_text = text[min(pos1 + len(entity1), pos2 + len(entity2)):max(pos1, pos2)]
-        words = list(jieba.cut(between_text))
-        
-        # 关系触发词
-        relation_triggers = ['投资', '收购', '合作', '签署', '发布', '研发']
-        
-        # 检查是否存在触发词
-        return any(trigger in words for trigger in relation_triggers)
 
-    def _determine_relation_type(self, text: str, entity1: Tuple[str, str, Dict], entity2: Tuple[str, str, Dict]) -> str:
+        # 触发词都是固定子串，直接做子串判断即可，无需对每个实体对重新分词
+        return any(trigger in between_text for trigger in self.RELATION_TRIGGERS)
+
+    def _determine_relation_type(self, text: str, entity1: Tuple[str, str, Dict], entity2: Tuple[str, str, Dict],
+                                 entity_positions: Dict[str, List[int]]) -> str:
         """确定两个实体之间的关系类型"""
         # 获取实体之间的文本
-        pos1 = text.find(entity1[0])
-        pos2 = text.find(entity2[0])
+        pos1 = entity_positions[entity1[0]][0]
+        pos2 = entity_positions[entity2[0]][0]
         between_text = text[min(pos1 + len(entity1[0]), pos2 + len(entity2[0])):max(pos1, pos2)]
         
         # 关系类型映射
@@ -230,32 +278,39 @@ class RelationExtractor(BaseProcessor):
         # 如果没有找到明确的关系类型，就尝试根据实体类型推断
         return self._infer_relation_by_types(entity1[1], entity2[1])
 
-    def _extract_cooccurrence_relations(self, text: str, entities: List[Tuple[str, str, Dict]]) -> List[Tuple[str, str, str, Dict]]:
+    def _extract_cooccurrence_relations(self, text: str, entities: List[Tuple[str, str, Dict]],
+                                        entity_positions: Dict[str, List[int]]) -> List[Tuple[str, str, str, Dict]]:
         """基于共现抽取关系"""
         cooccurrence_relations = []
         window_size = 50  # 共现窗口大小
-        
+
         for i, (entity1, type1, _) in enumerate(entities):
             for entity2, type2, _ in entities[i+1:]:
-                # 检查两个实体是否在指定窗口内共现
-                if self._check_cooccurrence(text, entity1, entity2, window_size):
+                # 检查两个实体是否在指定窗口内共现（考虑所有出现位置）
+                positions1 = entity_positions.get(entity1, [])
+                positions2 = entity_positions.get(entity2, [])
+                if self._check_cooccurrence(positions1, positions2, window_size):
                     properties = {
                         'confidence': 0.6,
                         'method': 'co-occurrence',
                         'window_size': int(window_size),
-                        'context': str(self.get_context_window(text, text.find(entity1), text.find(entity2)))
+                        'context': str(self.get_context_window(text, positions1[0], positions2[0]))
                     }
                     cooccurrence_relations.append((entity1, "共现", entity2, properties))
-        
+
         return cooccurrence_relations
 
-    def _check_cooccurrence(self, text: str, entity1: str, entity2: str, window_size: int) -> bool:
-        """检查两个实体是否在指定窗口内共现"""
-        pos1 = text.find(entity1)
-        pos2 = text.find(entity2)
-        if pos1 == -1 or pos2 == -1:
-            return False
-        return abs(pos1 - pos2) <= window_size
+    def _check_cooccurrence(self, positions1: List[int], positions2: List[int], window_size: int) -> bool:
+        """检查两个实体是否有任意一对出现位置落在窗口内（位置列表须升序）"""
+        i = j = 0
+        while i < len(positions1) and j < len(positions2):
+            if abs(positions1[i] - positions2[j]) <= window_size:
+                return True
+            if positions1[i] < positions2[j]:
+                i += 1
+            else:
+                j += 1
+        return False
 
     def _extract_relation_properties(self, head: str, tail: str, relation_type: str, context: str) -> Dict:
         """提取关系属性"""
@@ -273,23 +328,19 @@ class RelationExtractor(BaseProcessor):
 
     def _validate_and_deduplicate_relations(self, relations: List[Tuple[str, str, str, Dict]]) -> List[Tuple[str, str, str, Dict]]:
         """关系验证和去重"""
-        #集合去重
-        unique_relations = set((head, rel, tail) for head, rel, tail, _ in relations)
-
-        merged_relations = []
-        relation_properties = defaultdict(list)
-
+        # 单遍分组去重，(头, 关系, 尾) -> 属性列表
+        groups = {}
         for head, rel, tail, props in relations:
-            relation_properties[(head, rel, tail)].append(props)
-        
+            groups.setdefault((head, rel, tail), []).append(props)
+
         # 计算综合置信度
-        for (head, rel, tail) in unique_relations:
-            props_list = relation_properties[(head, rel, tail)]
-            merged_props = self._merge_relation_properties(props_list)
-            merged_relations.append((head, rel, tail, merged_props))
+        merged_relations = [
+            Relation(head, rel, tail, self._merge_relation_properties(props_list))
+            for (head, rel, tail), props_list in groups.items()
+        ]
 
         merged_relations.sort(key=lambda x: x[3].get('confidence', 0), reverse=True)
-        
+
         return merged_relations
 
     def _merge_relation_properties(self, props_list: List[Dict]) -> Dict:
@@ -317,6 +368,7 @@ class RelationExtractor(BaseProcessor):
         return merged
 
     def _get_current_timestamp(self) -> str:
-        """获取当前时间戳"""
-        from datetime import datetime
-        return datetime.now().strftime('%Y-%m-%d %H:%M:%S') 
\ No newline at end of file
+        """获取当前时间戳（extract_relations调用期间复用同一值）"""
+        if self._call_timestamp is not None:
+            return self._call_timestamp
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
\ No newline at end of file
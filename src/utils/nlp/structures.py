@@ -0,0 +1,20 @@
+from typing import Dict, NamedTuple
+
+
+class Entity(NamedTuple):
+    """实体 (文本, 类型, 属性)
+
+    NamedTuple没有实例字典，比普通对象省内存，
+    且仍是tuple，旧的解包/下标代码不受影响
+    """
+    name: str
+    label: str
+    props: Dict
+
+
+class Relation(NamedTuple):
+    """关系 (头实体, 关系类型, 尾实体, 属性)"""
+    head: str
+    rel_type: str
+    tail: str
+    props: Dict
@@ -1,5 +1,6 @@
 from typing import List, Tuple, Dict
 from datetime import datetime
+from functools import lru_cache
 import re
 from .base_processor import BaseProcessor
 
@@ -7,21 +8,26 @@ class TemporalAnalyzer(BaseProcessor):
     def __init__(self):
         """初始化时序分析器"""
         super().__init__()
+        # 同一次抽取内的解析失败统一落到这个时间，保证缓存可用且排序稳定
+        self._call_now = None
         self._init_time_patterns()
 
     def _init_time_patterns(self):
-        """初始化时间模式"""
+        """初始化时间模式（预编译）"""
         self.time_patterns = {
-            'date': r'\d{4}年\d{1,2}月\d{1,2}日',
-            'month': r'\d{4}年\d{1,2}月',
-            'year': r'\d{4}年',
-            'quarter': r'\d{4}年第[一二三四]季度',
-            'relative': r'[去今明后]年|上[个月季]|下[个月季]'
+            'date': re.compile(r'\d{4}年\d{1,2}月\d{1,2}日'),
+            'month': re.compile(r'\d{4}年\d{1,2}月'),
+            'year': re.compile(r'\d{4}年'),
+            'quarter': re.compile(r'\d{4}年第[一二三四]季度'),
+            'relative': re.compile(r'[去今明后]年|上[个月季]|下[个月季]')
         }
+        self._relative_year_pattern = re.compile(r'[去今明后]年')
+        self._year_digits_pattern = re.compile(r'\d{4}')
 
     def extract_temporal_relations(self, text: str, entities: List[Tuple[str, str, Dict]]) -> List[Tuple[str, str, str, Dict]]:
         """时序关系抽取"""
         temporal_relations = []
+        self._call_now = datetime.now()
         
         # 时间表达式
         time_entities = [(e[0], e[2].get('normalized', e[0])) 
@@ -58,17 +64,33 @@ class TemporalAnalyzer(BaseProcessor):
 
     def _parse_time(self, time_text: str) -> datetime:
         """解析时间表达式"""
+        parsed = self._parse_time_cached(time_text)
+        if parsed is not None:
+            return parsed
+        # 解析不了的默认返回当前时间（同一次抽取内保持同一时刻）
+        return self._call_now or datetime.now()
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _parse_time_cached(time_text: str):
+        """解析"Y年[M月[D日]]"格式，纯函数带缓存
+
+        排序和算时间差会反复解析同样的字符串，缓存后只算一次。
+        直接按分隔符切数字，省掉正则匹配和strptime解析格式串的开销
+        """
+        year, sep, rest = time_text.partition('年')
+        if not sep:
+            return None
         try:
-            if re.match(r'\d{4}年\d{1,2}月\d{1,2}日', time_text):
-                return datetime.strptime(time_text, '%Y年%m月%d日')
-            elif re.match(r'\d{4}年\d{1,2}月', time_text):
-                return datetime.strptime(time_text, '%Y年%m月')
-            elif re.match(r'\d{4}年', time_text):
-                return datetime.strptime(time_text, '%Y年')
-            else:
-                return datetime.now()  # 默认返回当前时间
-        except:
-            return datetime.now()
+            year = int(year)
+            month, sep, rest = rest.partition('月')
+            if not sep:
+                return datetime(year, 1, 1)
+            month = int(month)
+            day, sep, _ = rest.partition('日')
+            return datetime(year, month, int(day) if sep else 1)
+        except ValueError:
+            return None
 
     def _calculate_time_diff(self, time1: str, time2: str) -> str:
         """计算时间差"""
@@ -105,7 +127,7 @@ class TemporalAnalyzer(BaseProcessor):
     def normalize_time(self, time_text: str) -> str:
         """标准化时间表达式"""
         #相对时间
-        if re.match(r'[去今明后]年', time_text):
+        if self._relative_year_pattern.match(time_text):
             current_year = datetime.now().year
             if time_text.startswith('去'):
                 return f"{current_year-1}年"
@@ -120,7 +142,7 @@ class TemporalAnalyzer(BaseProcessor):
             quarter_map = {'一': 1, '二': 2, '三': 3, '四': 4}
             for zh, num in quarter_map.items():
                 if zh in time_text:
-                    year = re.findall(r'\d{4}', time_text)[0]
+                    year = self._year_digits_pattern.findall(time_text)[0]
                     return f"{year}年Q{num}"
         
         return time_text 
\ No newline at end of file